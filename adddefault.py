@@ -1,8 +1,13 @@
 import ast
 import os
 
-class AddDefaultArgValue(ast.NodeTransformer):
+from refactorbase import ReentrantRefactor
+
+class AddDefaultArgValue(ast.NodeTransformer, ReentrantRefactor):
     def __init__(self):
+        self.reset_state()
+
+    def reset_state(self):
         self.func_par_map = {}  # Maps function names to parameter lists
         self.par_con_map = {}   # Maps parameter names to constant values
         self.con_par_map = {}   # Maps constant values to parameter names
@@ -66,6 +71,7 @@ class AddDefaultArgValue(ast.NodeTransformer):
                 kwarg=node.args.kwarg,
                 defaults=new_defaults
             )
+            self.changed = True
             ast.fix_missing_locations(node)
         return self.generic_visit(node)
 
@@ -78,27 +84,30 @@ class AddDefaultArgValue(ast.NodeTransformer):
             if isinstance(arg, ast.Constant) and arg.value in self.con_par_map:
                 new_args.remove(arg)
                 new_args.append(ast.Name(id=self.con_par_map[arg.value], ctx=ast.Load()))
+                self.changed = True
         # Replace keyword arguments
         for kw in node.keywords:
             if isinstance(kw.value, ast.Constant) and kw.value.value in self.con_par_map:
                 new_args.append(ast.Name(id=self.con_par_map[kw.value.value], ctx=ast.Load()))
                 new_keywords.remove(kw)
+                self.changed = True
         node.args = new_args
         node.keywords = new_keywords
         ast.fix_missing_locations(node)
         return node
 
-    def refactor_functions(self, tree):
-        self.collect_mappings(tree)
-        self.con_par_map = {}  # Reset before second pass
-        self.visit(tree)
-        ast.fix_missing_locations(tree)
-        return ast.unparse(tree)
+    def refactor_functions(self, tree, *, source_code=None):
+        worker = self.fork()
+        worker.collect_mappings(tree)
+        if not worker.func_par_map:  # No constants to lift, so no call can change either
+            return worker.finish(tree, source_code=source_code)
+        worker.con_par_map = {}  # Reset before second pass
+        worker.visit(tree)
+        return worker.finish(tree, source_code=source_code)
 
     def get_refactored_code(self, source_code):
         try:
             tree = ast.parse(source_code)
-            self.print_mappings()
-            return self.refactor_functions(tree)
+            return self.refactor_functions(tree, source_code=source_code)
         except SyntaxError as e:
             raise ValueError(f"Syntax error in source code: {e}")
@@ -1,8 +1,10 @@
 import ast
 import os
-import random
 
-class TryExceptRefactor(ast.NodeTransformer):
+from editscript import VariantEditScript
+from refactorbase import ReentrantRefactor
+
+class TryExceptRefactor(ast.NodeTransformer, ReentrantRefactor):
     ERROR_MESSAGES = ['ERROR: ', "Exception encountered: ", "Operation Failed: "]
     EXCEPTION_POOL = ['e', 'exception', 'exc', 'err', 'error']
 
@@ -19,7 +21,7 @@ class TryExceptRefactor(ast.NodeTransformer):
                             args=[
                                 ast.JoinedStr(
                                     values=[
-                                        ast.Constant(value=random.choice(self.ERROR_MESSAGES)),
+                                        ast.Constant(value=self.rng.choice(self.ERROR_MESSAGES)),
                                         ast.FormattedValue(
                                             value=ast.Name(id=exc_id, ctx=ast.Load()),
                                             conversion=-1
@@ -43,7 +45,7 @@ class TryExceptRefactor(ast.NodeTransformer):
         init_body = [elem for elem in node.body]
         
         # Generate try-except block with a random exception name
-        exc_id = random.choice(self.EXCEPTION_POOL)
+        exc_id = self.rng.choice(self.EXCEPTION_POOL)
         new_body = [
             ast.Try(
                 body=init_body,
@@ -55,20 +57,27 @@ class TryExceptRefactor(ast.NodeTransformer):
         
         # Update the function body
         node.body = new_body
+        self.changed = True
         ast.fix_missing_locations(node)
         self.generic_visit(node)
         return node
            
-    def refactor_try_except(self, tree):           
+    def refactor_try_except(self, tree, *, rng=None, source_code=None):
         """Process the AST to add try-except blocks and return modified code."""
-        self.visit(tree)
-        ast.fix_missing_locations(tree)
-        return ast.unparse(tree)
+        worker = self.fork(rng)
+        worker.visit(tree)
+        return worker.finish(tree, source_code=source_code)
 
-    def get_refactored_code(self, source_code):                                                       
+    def get_refactored_code(self, source_code, *, rng=None):
         """Parse source code, add try-except blocks, and return modified code."""
         try:
             tree = ast.parse(source_code)
-            return self.refactor_try_except(tree)
+            return self.refactor_try_except(tree, rng=rng, source_code=source_code)
         except SyntaxError as e:
             raise ValueError(f"Syntax error in source code: {e}")
+
+    def get_edit_script(self, source_code, *, rng=None):
+        """Refactor source code and return the variant as an edit script against it."""
+        refactored_code = self.get_refactored_code(source_code, rng=rng)
+        return VariantEditScript().create(source_code, refactored_code,
+                                          meta={"transform": type(self).__name__})
@@ -0,0 +1,126 @@
+import ast
+import io
+import json
+
+# The emitter hooks into CPython's private unparser (streams on 3.11 to 3.13).
+# Older versions lack maybe_newline and newer ones move it to its own module;
+# if it is missing or its internals differ, CodeEmitter falls back to chunking
+# the output of `ast.unparse`.
+try:
+    from ast import _Unparser
+except ImportError:
+    try:
+        from _ast_unparse import Unparser as _Unparser
+    except ImportError:
+        _Unparser = None
+
+STREAMING = _Unparser is not None and all(
+    hasattr(_Unparser, name) for name in ("write", "buffered", "maybe_newline", "traverse"))
+
+
+class CodeEmitter(_Unparser if STREAMING else ast.NodeVisitor):
+    """Unparse a tree straight into a writable sink, chunk by chunk.
+
+    Output is identical to `ast.unparse`; only the top-level buffer is ever
+    flushed, so nested buffering used for f-strings keeps working. Without
+    a usable private unparser (see STREAMING) the full text of
+    `ast.unparse` is built first and then written in chunks.
+    """
+
+    def __init__(self, sink=None, chunk_size=8192, encoding="utf-8", binary=None, **kwargs):
+        # `ast._Unparser` builds helper instances via type(self)(_avoid_backslashes=True),
+        # so a sink-less emitter falls back to plain string output.
+        super().__init__(**kwargs)
+        if not STREAMING:
+            self._source = []
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.binary = self.is_binary(sink) if binary is None else binary
+        self._root = self._source  # Top-level buffer, the only one flushed to the sink
+        self._pending = 0          # Characters buffered since the last flush
+        self._flushed = 0          # Characters already written to the sink
+
+    @staticmethod
+    def is_binary(sink):
+        """Guess whether a sink expects bytes rather than str."""
+        if sink is None or isinstance(sink, io.TextIOBase):
+            return False
+        if isinstance(sink, (io.RawIOBase, io.BufferedIOBase)):
+            return True
+        return "b" in getattr(sink, "mode", "")
+
+    def write(self, *text):
+        self._source.extend(text)
+        if self.sink is not None and self._source is self._root:
+            self._pending += sum(map(len, text))
+            if self._pending >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """Write the buffered top-level output to the sink."""
+        if not self._root:
+            return
+        chunk = "".join(self._root)
+        self._root.clear()
+        self._pending = 0
+        self._flushed += len(chunk)
+        self.sink.write(chunk.encode(self.encoding) if self.binary else chunk)
+
+    def maybe_newline(self):
+        """Adds a newline if it isn't the start of generated source"""
+        if self._source or (self._source is self._root and self._flushed):
+            self.write("\n")
+
+    def visit(self, node):
+        """Emit source for `node` to the sink and return the number of characters written."""
+        if not STREAMING:
+            return self.visit_unparsed(node)
+        if self.sink is None:
+            return super().visit(node)
+        self._root = self._source = []
+        self._pending = 0
+        self._flushed = 0
+        self.traverse(node)
+        self.flush()
+        return self._flushed
+
+    def visit_unparsed(self, node):
+        """Fallback: write `ast.unparse(node)` to the sink in chunk_size pieces."""
+        text = ast.unparse(node)
+        if self.sink is None:
+            return text
+        self._flushed = 0
+        for start in range(0, len(text), self.chunk_size):
+            self._root.append(text[start:start + self.chunk_size])
+            self.flush()
+        return len(text)
+
+    def emit(self, tree):
+        """Emit the source for `tree`, filling in missing locations first."""
+        ast.fix_missing_locations(tree)
+        return self.visit(tree)
+
+
+class JsonlRecordWriter:
+    """Dataset writer that streams each unparsed tree into one JSONL record."""
+
+    def __init__(self, sink, field="text", chunk_size=8192):
+        self.sink = sink
+        self.field = field
+        self.chunk_size = chunk_size
+        self.records = 0
+
+    def write(self, chunk):
+        # Called by CodeEmitter; JSON escaping is per character, so chunks escape independently
+        self.sink.write(json.dumps(chunk)[1:-1])
+
+    def write_record(self, tree, **fields):
+        """Write `{"<field>": <source of tree>, **fields}` followed by a newline."""
+        self.sink.write("{" + json.dumps(self.field) + ': "')
+        CodeEmitter(self, chunk_size=self.chunk_size, binary=False).emit(tree)
+        self.sink.write('"')
+        for key, value in fields.items():
+            self.sink.write(", " + json.dumps(key) + ": " + json.dumps(value))
+        self.sink.write("}\n")
+        self.records += 1
@@ -0,0 +1,409 @@
+import ast
+import copy
+import hashlib
+import json
+
+from codeemitter import CodeEmitter
+from refactorbase import RefactoredCode
+
+class VariantEditScript:
+    """Store variants as edit scripts against their base program.
+
+    The reference tree of a script is its base program with the renames and
+    parameter permutations listed in the script's meta already replayed. A
+    script is the variant tree in which every subtree or list that also
+    occurs in the reference is replaced by its node path there, e.g.
+    `{"@": ["body", 0]}`, or by `{}` when that path is its own. Only the
+    nodes a transformer changed beyond its meta are spelled out.
+    """
+
+    IDENTITY = {"@": []}  # Tree of a variant the refactorer left unchanged
+
+    def __init__(self):
+        self.bases = {}    # Maps base digests to parsed trees
+        self.indexes = {}  # Maps base digests to subtree indexes, built when encoding
+
+    @staticmethod
+    def digest(base_code):
+        return hashlib.sha1(base_code.encode("utf-8")).hexdigest()
+
+    def load_base(self, base_code):
+        """Parse a base program once; returns its digest and tree."""
+        key = self.digest(base_code)
+        if key not in self.bases:
+            try:
+                self.bases[key] = ast.parse(base_code)
+            except SyntaxError as e:
+                raise ValueError(f"Syntax error in source code: {e}")
+        return key, self.bases[key]
+
+    @staticmethod
+    def list_key(nodes, dumps=None):
+        """Structural key of a list of nodes, or None if it holds anything else."""
+        if not nodes or not all(isinstance(node, ast.AST) for node in nodes):
+            return None
+        return "[" + ",".join(dumps[id(node)] if dumps else ast.dump(node) for node in nodes)
+
+    @staticmethod
+    def index(tree):
+        """Map subtree and list keys to their first node path, and node paths to keys."""
+        paths = {}  # Maps keys to the first node path they occur at
+        keys = {}   # Maps node paths (as tuples) to their keys
+        dumps = {}  # Maps id(node) to ast.dump(node), so list keys reuse element dumps
+        stack = [(tree, [])]
+        while stack:
+            node, path = stack.pop()
+            if isinstance(node, list):
+                for value in node:
+                    if isinstance(value, ast.AST):
+                        dumps[id(value)] = ast.dump(value)
+                key = VariantEditScript.list_key(node, dumps)
+                children = [(value, path + [idx]) for idx, value in enumerate(node)
+                            if isinstance(value, ast.AST)]
+            else:
+                key = (dumps.pop(id(node), None) or ast.dump(node)) if node._fields else None
+                children = [(value, path + [field]) for field, value in ast.iter_fields(node)
+                            if isinstance(value, (ast.AST, list))]
+            if key is not None:
+                paths.setdefault(key, path)
+                keys[tuple(path)] = key
+            stack.extend(reversed(children))
+        return paths, keys
+
+    @staticmethod
+    def apply_meta(tree, meta):
+        """Return `tree` with the renames and parameter permutations of `meta` replayed.
+
+        This mirrors FuncVarNameRefactator: definitions and names are renamed,
+        a permutation sets the parameters of the function it is keyed by, and
+        calls to that function keep their leading positional arguments, padded
+        with the parameter names. Only changed nodes and their ancestors are
+        copied; the rest is shared with `tree`, which is never modified.
+        """
+        renames = meta.get("renames") or {}
+        permutations = meta.get("permutations") or {}
+        if not renames and not permutations:
+            return tree
+
+        def replay(node):
+            changes = {}
+            for field, value in ast.iter_fields(node):
+                if isinstance(value, ast.AST):
+                    new = replay(value)
+                    if new is not value:
+                        changes[field] = new
+                elif isinstance(value, list):
+                    new = [replay(item) if isinstance(item, ast.AST) else item for item in value]
+                    if any(a is not b for a, b in zip(new, value)):
+                        changes[field] = new
+
+            if isinstance(node, ast.FunctionDef):
+                name = renames.get(node.name, node.name)
+                if name != node.name:
+                    changes["name"] = name
+                params = permutations.get(name)
+                args = changes.get("args", node.args)
+                if params is not None and len(params) == len(args.args) and \
+                        [arg.arg for arg in args.args] != params:
+                    args = copy.copy(args)
+                    args.args = [copy.copy(arg) for arg in args.args]
+                    for arg, param in zip(args.args, params):
+                        arg.arg = param
+                    changes["args"] = args
+            elif isinstance(node, ast.Name) and renames.get(node.id, node.id) != node.id:
+                changes["id"] = renames[node.id]
+            elif isinstance(node, ast.Call):
+                func = changes.get("func", node.func)
+                if isinstance(func, ast.Name) and func.id in permutations:
+                    params = permutations[func.id]
+                    args = changes.get("args", node.args)
+                    if len(args) != len(params):
+                        changes["args"] = args[:len(params)] + [ast.Name(id=param, ctx=ast.Load())
+                                                                for param in params[len(args):]]
+
+            if not changes:
+                return node
+            node = copy.copy(node)
+            for field, value in changes.items():
+                setattr(node, field, value)
+            return node
+
+        return replay(tree)
+
+    def replay(self, base_code, meta, references=None):
+        """Return the base digest and the reference tree for `meta`.
+
+        `references` caches replayed trees per base, renames and permutations,
+        so variants sharing a meta replay it once. Referenced nodes are shared
+        by the decoded trees and never modified.
+        """
+        key, tree = self.load_base(base_code)
+        meta = meta or {}
+        if not meta.get("renames") and not meta.get("permutations"):
+            return key, tree
+        cache_key = (key, json.dumps(meta.get("renames"), sort_keys=True),
+                     json.dumps(meta.get("permutations"), sort_keys=True))
+        if references is not None and cache_key in references:
+            return key, references[cache_key]
+        reference = self.apply_meta(tree, meta)
+        if references is not None:
+            references[cache_key] = reference
+        return key, reference
+
+    def reference(self, base_code, meta):
+        """Return the base digest, the reference tree for `meta` and its index."""
+        key, reference = self.replay(base_code, meta)
+        if reference is self.bases[key]:
+            if key not in self.indexes:
+                self.indexes[key] = self.index(reference)
+            return key, reference, self.indexes[key]
+        return key, reference, self.index(reference)
+
+    def count_subtrees(self, tree):
+        """Count structurally equal subtrees of a variant, to share repeated insertions."""
+        counts = {}
+        for node in ast.walk(tree):
+            if node._fields:
+                key = ast.dump(node)
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    @staticmethod
+    def snippet(node, key):
+        """Encode a statement as `{";": source}` or an expression as `{"'": source}`.
+
+        Returns None for other nodes and when the source does not parse back
+        to the same tree.
+        """
+        try:
+            if isinstance(node, ast.stmt):
+                source = ast.unparse(node)
+                parsed = ast.parse(source).body
+                encoded = {";": source}
+            elif isinstance(node, ast.expr):
+                source = ast.unparse(node)
+                parsed = [ast.parse(source, mode="eval").body]
+                encoded = {"'": source}
+            else:
+                return None
+        except SyntaxError:
+            return None
+        return encoded if len(parsed) == 1 and ast.dump(parsed[0]) == key else None
+
+    @staticmethod
+    def patch(changes):
+        """Build a patch; a nested patch with a single change is merged into its key as `a.b`."""
+        merged = {}
+        for key, value in changes.items():
+            while isinstance(value, dict) and list(value) == ["~"] and len(value["~"]) == 1:
+                (step, value), = value["~"].items()
+                key = f"{key}.{step}"
+            merged[key] = value
+        return {"~": merged}
+
+    def find(self, key, path, index):
+        """Return a reference to `key` in the reference tree, or None if it is not there."""
+        paths, keys = index
+        if keys.get(tuple(path)) == key:
+            return {}
+        if key in paths:
+            return self.encode_ref(paths[key], path)
+        return None
+
+    def encode(self, node, path, reference, index, shared):
+        """Encode a variant (sub)tree found at `path`.
+
+        Subtrees and lists present anywhere in the reference become
+        `{"@": path}`, or `{"<": n, "@": suffix}` relative to the n-th
+        ancestor of `path` when that is shorter, or `{}` at their own path;
+        a node of the same type, or a list of the same length, at the same
+        path in the reference becomes a patch `{"~": {field or index: value}}`
+        listing only what differs, with single-change chains collapsed into
+        one dotted key such as `"value.func.id"`; anything else is spelled
+        out, as source text when that is shorter (see `snippet`) or field by
+        field without its None fields and Load contexts, and
+        repeated spelled-out subtrees are written once (`"=": id`) and
+        referenced afterwards (`{"#": id}`).
+        """
+        if isinstance(node, list):
+            key = self.list_key(node)
+            found = None if key is None else self.find(key, path, index)
+            if found is not None:
+                return found
+            items = [self.encode(value, path + [idx], reference, index, shared)
+                     for idx, value in enumerate(node)]
+            peer = self.resolve(reference, path)
+            if isinstance(peer, list) and len(peer) == len(node):
+                return self.patch({str(idx): item for idx, item in enumerate(items) if item != {}})
+            return items
+        if not isinstance(node, ast.AST):
+            if node is None or isinstance(node, (str, bool, int, float)):
+                return node
+            # bytes and complex round-trip through repr; Ellipsis's repr is not a literal
+            return {"$": "..." if node is Ellipsis else repr(node)}
+        if not node._fields:
+            return {"_": type(node).__name__}
+
+        key = ast.dump(node)
+        found = self.find(key, path, index)
+        if found is not None:
+            return found
+        if key in shared["ids"]:
+            return {"#": shared["ids"][key]}
+
+        peer = self.resolve(reference, path)
+        if type(peer) is type(node):
+            changes = {}
+            for field, value in ast.iter_fields(node):
+                if not self.same_value(value, getattr(peer, field, None)):
+                    changes[field] = self.encode(value, path + [field], reference, index, shared)
+            encoded = self.patch(changes)
+        else:
+            known = len(shared["ids"])
+            encoded = {"_": type(node).__name__}
+            for field, value in ast.iter_fields(node):
+                if value is None or (field == "ctx" and isinstance(value, ast.Load)):
+                    continue
+                encoded[field] = self.encode(value, path + [field], reference, index, shared)
+            snippet = self.snippet(node, key)
+            if snippet is not None and len(json.dumps(snippet)) < len(json.dumps(encoded)):
+                # Drop ids defined inside the discarded encoding; none are referenced yet
+                for dump in list(shared["ids"])[known:]:
+                    del shared["ids"][dump]
+                encoded = snippet
+
+        if shared["counts"].get(key, 0) > 1:
+            shared["ids"][key] = encoded["="] = len(shared["ids"])
+        return encoded
+
+    @staticmethod
+    def encode_ref(target, path):
+        common = 0
+        while common < min(len(target), len(path)) and target[common] == path[common]:
+            common += 1
+        if common > 1:
+            return {"<": len(path) - common, "@": target[common:]}
+        return {"@": target}
+
+    @staticmethod
+    def same_value(value, base_value):
+        if isinstance(value, ast.AST):
+            return isinstance(base_value, ast.AST) and ast.dump(value) == ast.dump(base_value)
+        if isinstance(value, list):
+            return (isinstance(base_value, list) and len(value) == len(base_value) and
+                    all(VariantEditScript.same_value(v, b) for v, b in zip(value, base_value)))
+        return type(value) is type(base_value) and value == base_value
+
+    @staticmethod
+    def resolve(tree, path):
+        """Return the node at `path` in `tree`, or None if the path does not exist."""
+        node = tree
+        for step in path:
+            if isinstance(step, int):
+                if not isinstance(node, list) or step >= len(node):
+                    return None
+                node = node[step]
+            else:
+                node = getattr(node, step, None)
+        return node
+
+    def decode(self, encoded, path, reference, shared):
+        """Rebuild a tree from its encoded form; referenced nodes are shared, not copied."""
+        if isinstance(encoded, list):
+            return [self.decode(value, path + [idx], reference, shared)
+                    for idx, value in enumerate(encoded)]
+        if not isinstance(encoded, dict):
+            return encoded
+        if not encoded:
+            return self.resolve(reference, path)
+        if "#" in encoded:
+            return shared[encoded["#"]]
+        if "$" in encoded:
+            return ast.literal_eval(encoded["$"])
+        if ";" in encoded:
+            node = ast.parse(encoded[";"]).body[0]
+        elif "'" in encoded:
+            node = ast.parse(encoded["'"], mode="eval").body
+        elif "@" in encoded:
+            target = encoded["@"]
+            if "<" in encoded:
+                target = path[:len(path) - encoded["<"]] + target
+            node = self.resolve(reference, target)
+        elif "~" in encoded:
+            node = copy.copy(self.resolve(reference, path))
+            for key, value in encoded["~"].items():
+                step, _, rest = key.partition(".")
+                if rest:
+                    value = {"~": {rest: value}}
+                if isinstance(node, list):
+                    step = int(step)
+                    node[step] = self.decode(value, path + [step], reference, shared)
+                else:
+                    setattr(node, step, self.decode(value, path + [step], reference, shared))
+        else:
+            node_type = getattr(ast, encoded["_"])
+            fields = {field: ast.Load() if field == "ctx" else None for field in node_type._fields}
+            fields.update({field: self.decode(value, path + [field], reference, shared)
+                           for field, value in encoded.items() if field not in ("_", "=")})
+            node = node_type(**fields)
+        if "=" in encoded:
+            shared[encoded["="]] = node
+        return node
+
+    def create(self, base_code, variant_code, meta=None):
+        """Create the edit script turning `base_code` into `variant_code`."""
+        if isinstance(variant_code, RefactoredCode) and not variant_code.changed:
+            return {"base": self.digest(base_code), "tree": dict(self.IDENTITY), "meta": meta or {}}
+        key, reference, index = self.reference(base_code, meta)
+        try:
+            variant_tree = ast.parse(variant_code)
+        except SyntaxError as e:
+            raise ValueError(f"Syntax error in source code: {e}")
+        shared = {"counts": self.count_subtrees(variant_tree), "ids": {}}
+        encoded = self.encode(variant_tree, [], reference, index, shared)
+        return {"base": key, "tree": encoded, "meta": meta or {}}
+
+    @staticmethod
+    def dumps(script):
+        """Serialize a script compactly, e.g. as one line of a JSONL dataset."""
+        return json.dumps(script, separators=(",", ":"))
+
+    def build_tree(self, script, base_code, references=None):
+        """Decode a script against its replayed base; no subtree index is needed."""
+        key, reference = self.replay(base_code, script.get("meta"), references)
+        if script["base"] != key:
+            raise ValueError("Edit script was not created against this base program")
+        tree = self.decode(script["tree"], [], reference, {})
+        ast.fix_missing_locations(tree)
+        return tree
+
+    def materialize(self, script, base_code, references=None):
+        """Rebuild the full variant text of a single script.
+
+        An unchanged variant is the base text itself, comments and layout included.
+        """
+        if script["tree"] == self.IDENTITY:
+            if script["base"] != self.digest(base_code):
+                raise ValueError("Edit script was not created against this base program")
+            return base_code
+        return ast.unparse(self.build_tree(script, base_code, references))
+
+    def materialize_all(self, scripts, base_code, sink=None):
+        """Rebuild many variants of one base.
+
+        The base is parsed once and each distinct meta is replayed once.
+        Without a sink the texts are returned as a list; with one they are
+        streamed to it through CodeEmitter, one variant per line block.
+        """
+        references = {}
+        if sink is None:
+            return [self.materialize(script, base_code, references) for script in scripts]
+        emitter = CodeEmitter(sink)
+        for script in scripts:
+            if script["tree"] == self.IDENTITY:
+                text = self.materialize(script, base_code)
+                sink.write(text.encode(emitter.encoding) if emitter.binary else text)
+            else:
+                emitter.emit(self.build_tree(script, base_code, references))
+            sink.write(b"\n" if emitter.binary else "\n")
+        return None
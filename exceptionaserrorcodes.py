@@ -1,7 +1,10 @@
 import ast
 import os
 
-class ExceptionRefactor(ast.NodeTransformer):
+from editscript import VariantEditScript
+from refactorbase import ReentrantRefactor
+
+class ExceptionRefactor(ast.NodeTransformer, ReentrantRefactor):
     def visit_Try(self, node):
         new_body = node.body.copy()
         new_handlers = [handler for handler in node.handlers]  # Copy handlers
@@ -35,6 +38,9 @@ class ExceptionRefactor(ast.NodeTransformer):
                 )
                 ast.fix_missing_locations(new_handlers[handler_idx])
 
+        if append_return or remove_returns:
+            self.changed = True
+
         if remove_returns:
             new_body = [stmt for stmt in new_body if not isinstance(stmt, ast.Return)]
 
@@ -53,6 +59,7 @@ class ExceptionRefactor(ast.NodeTransformer):
         for idx, stmt in enumerate(new_body):
             if isinstance(stmt, ast.Raise):
                 new_body[idx] = ast.Return(value=ast.Constant(value=1))
+                self.changed = True
                 ast.fix_missing_locations(new_body[idx])
             elif (isinstance(stmt, ast.Return) and 
                   isinstance(stmt.value, ast.Constant) and 
@@ -64,12 +71,14 @@ class ExceptionRefactor(ast.NodeTransformer):
                         keywords=[]
                     )
                 )
+                self.changed = True
                 ast.fix_missing_locations(new_body[idx])
 
         # Process else body
         for idx, stmt in enumerate(new_orelse):
             if isinstance(stmt, ast.Raise):
                 new_orelse[idx] = ast.Return(value=ast.Constant(value=0))
+                self.changed = True
                 ast.fix_missing_locations(new_orelse[idx])
             elif (isinstance(stmt, ast.Return) and 
                   isinstance(stmt.value, ast.Constant) and 
@@ -81,20 +90,27 @@ class ExceptionRefactor(ast.NodeTransformer):
                         keywords=[]
                     )
                 )
+                self.changed = True
                 ast.fix_missing_locations(new_orelse[idx])
 
         node.body = new_body
         node.orelse = new_orelse
         return self.generic_visit(node)
 
-    def refactor_exceptions(self, tree):
-        self.visit(tree)
-        ast.fix_missing_locations(tree)
-        return ast.unparse(tree)
+    def refactor_exceptions(self, tree, *, source_code=None):
+        worker = self.fork()
+        worker.visit(tree)
+        return worker.finish(tree, source_code=source_code)
 
     def get_refactored_code(self, source_code):
         try:
             tree = ast.parse(source_code)
-            return self.refactor_exceptions(tree)
+            return self.refactor_exceptions(tree, source_code=source_code)
         except SyntaxError as e:
             raise ValueError(f"Syntax error in source code: {e}")
+
+    def get_edit_script(self, source_code):
+        """Refactor source code and return the variant as an edit script against it."""
+        refactored_code = self.get_refactored_code(source_code)
+        return VariantEditScript().create(source_code, refactored_code,
+                                          meta={"transform": type(self).__name__})
@@ -1,8 +1,24 @@
 import ast
 import os
 
-class LoopRefactor(ast.NodeTransformer):
+from patternrules import ANY, Capture, Node, RuleSet
+from refactorbase import ReentrantRefactor
+
+class LoopRefactor(ast.NodeTransformer, ReentrantRefactor):
+    RULES = RuleSet([
+        # while i < len(x): ...
+        ("while_len", Node(ast.While, test=Node(
+            ast.Compare, left=Capture("iterator", Node(ast.Name)),
+            comparators=[Node(ast.Call, args=[Capture("bound", Node(ast.Name)), ...])]))),
+        # for i in range(0, len(x)): ...
+        ("for_range_len", Node(ast.For, target=Capture("iterator", Node(ast.Name)), iter=Node(
+            ast.Call, args=[ANY, Node(ast.Call, args=[Capture("bound", Node(ast.Name)), ...]), ...]))),
+    ])
+
     def __init__(self):
+        self.reset_state()
+
+    def reset_state(self):
         self.while_id_map = {}        # Maps while iterators to their bounds
         self.while_nested_dict = {}   # Maps bounds to while loop bodies
         self.for_id_map = {}          # Maps for iterators to their bounds
@@ -17,35 +33,20 @@ class LoopRefactor(ast.NodeTransformer):
         self.for_id_map = {}
         self.for_nested_dict = {}
         for node in ast.walk(tree):
-            if isinstance(node, ast.While) and isinstance(node.test, ast.Compare):
+            match = self.RULES.match(node)
+            if match is None:
+                continue
+            rule, captures = match
+            iterator = captures["iterator"].id
+            bound = captures["bound"].id  # Assumes len(x)
+            if rule == "while_len":
                 # Extract while loop body, excluding AugAssign
-                while_body = []
-                constant_iterator = None
-                for elem in node.body:
-                    if not isinstance(elem, ast.AugAssign):
-                        while_body.append(elem)
-                    else:
-                        constant_iterator = elem.value
-                # Extract iterator and bound
-                if (isinstance(node.test.left, ast.Name) and 
-                    len(node.test.comparators) == 1 and 
-                    isinstance(node.test.comparators[0], ast.Call) and 
-                    isinstance(node.test.comparators[0].args[0], ast.Name)):
-                    while_iterator = node.test.left.id
-                    while_bound = node.test.comparators[0].args[0].id  # Assumes len(x)
-                    self.while_id_map[while_iterator] = while_bound
-                    self.while_nested_dict[while_bound] = while_body
-            elif isinstance(node, ast.For):
-                # Extract for loop details
-                if (isinstance(node.target, ast.Name) and 
-                    isinstance(node.iter, ast.Call) and 
-                    len(node.iter.args) > 1 and 
-                    isinstance(node.iter.args[1], ast.Call) and 
-                    isinstance(node.iter.args[1].args[0], ast.Name)):
-                    for_iterator = node.target.id
-                    for_bound = node.iter.args[1].args[0].id  # Assumes range(0, len(x))
-                    self.for_id_map[for_iterator] = for_bound
-                    self.for_nested_dict[for_bound] = node.body
+                while_body = [elem for elem in node.body if not isinstance(elem, ast.AugAssign)]
+                self.while_id_map[iterator] = bound
+                self.while_nested_dict[bound] = while_body
+            elif rule == "for_range_len":
+                self.for_id_map[iterator] = bound
+                self.for_nested_dict[bound] = node.body
 
     def visit_FunctionDef(self, node):
         """Modify FunctionDef nodes to convert while and for loops."""
@@ -60,6 +61,7 @@ class LoopRefactor(ast.NodeTransformer):
                 isinstance(node_elem.test.left, ast.Name) and 
                 node_elem.test.left.id in self.while_id_map):
                 # Convert while to for
+                self.changed = True
                 new_body[idx] = ast.For(
                     target=ast.Name(id=node_elem.test.left.id, ctx=ast.Store()),
                     iter=ast.Call(
@@ -95,6 +97,7 @@ class LoopRefactor(ast.NodeTransformer):
                         )
                     )
                     # Convert for to while
+                    self.changed = True
                     new_body[idx] = ast.While(
                         test=ast.Compare(
                             left=ast.Name(id=iterator, ctx=ast.Load()),
@@ -115,17 +118,17 @@ class LoopRefactor(ast.NodeTransformer):
         self.generic_visit(node)
         return node
 
-    def refactor_loops(self, tree):
+    def refactor_loops(self, tree, *, source_code=None):
         """Process the AST to refactor loops and return modified code."""
-        self.visit(tree)
-        ast.fix_missing_locations(tree)
-        return ast.unparse(tree)
+        worker = self.fork()
+        worker.visit(tree)
+        return worker.finish(tree, source_code=source_code)
 
     def get_refactored_code(self, source_code):
         """Parse source code, refactor loops, and return modified code."""
         try:
             tree = ast.parse(source_code)
-            return self.refactor_loops(tree)
+            return self.refactor_loops(tree, source_code=source_code)
         except SyntaxError as e:
             raise ValueError(f"Syntax error in source code: {e}")
 
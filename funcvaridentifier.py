@@ -1,8 +1,11 @@
 import ast
 import os
-import random
 
-class FuncVarNameRefactator:
+from editscript import VariantEditScript
+from patternrules import Capture, Node, OneOf, RuleSet
+from refactorbase import ReentrantRefactor
+
+class FuncVarNameRefactator(ReentrantRefactor):
     def __init__(self):
         # Predefined data structures
         self.code_identifiers = [
@@ -24,11 +27,30 @@ class FuncVarNameRefactator:
         self.key_types = ['DSA', 'RSA', 'ECC']
         self.key_sizes = [256, 512, 1024, 2048, 4096]
         self.ecc_key_sizes = ['p192', 'p224', 'p256', 'p384', 'p521']
+        self.rules = RuleSet([
+            ("function_def", Node(ast.FunctionDef)),
+            # key = RSA.generate(...), signature = signer.sign(...), ...
+            ("identifier_assign", Node(
+                ast.Assign,
+                targets=[Capture("target", Node(ast.Name, id=OneOf(self.code_identifiers))), ...],
+                value=Node(ast.Call, func=Node(ast.Attribute)))),
+            # pkcs1_15.new(key)
+            ("signer_new", Node(ast.Call, func=Node(ast.Attribute, attr="new"))),
+            # RSA.generate(2048)
+            ("key_generate", Node(ast.Call, func=Node(ast.Attribute, attr="generate"))),
+        ])
+        self.reset_state()
+
+    def reset_state(self):
         self.old_names = {}  # Maps old identifiers to new ones
         self.func_perm = {}  # Maps function names to parameter permutations
 
-    def mutate_code(self, source_code):
+    def mutate_code(self, source_code, *, rng=None):
         """Mutate source code by renaming identifiers and shuffling parameters."""
+        return self.fork(rng).apply_mutations(source_code)
+
+    def apply_mutations(self, source_code):
+        """Run one mutation on this worker, leaving its rename map and permutations behind."""
         if isinstance(source_code, bytes):
             source_code = source_code.decode("utf-8")
         try:
@@ -38,20 +60,28 @@ class FuncVarNameRefactator:
 
         self.old_names = {}
         self.func_perm = {}
+        self.changed = False
 
         # First pass: Mutate function definitions and assignments
         for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
+            match = self.rules.match(node)
+            if match is None:
+                continue
+            rule, captures = match
+
+            if rule == "function_def":
                 # Rename function
                 old_func_name = node.name
-                node.name = random.choice(self.identifiers.get(old_func_name, [old_func_name]))
+                node.name = self.rng.choice(self.identifiers.get(old_func_name, [old_func_name]))
                 self.old_names[old_func_name] = node.name
+                if node.name != old_func_name:
+                    self.changed = True
 
                 # Mutate and shuffle parameters
                 par_values = [arg.arg for arg in node.args.args]
                 for arg in node.args.args:
                     if arg.arg not in self.identifiers:
-                        new_name = random.choice(self.identifiers.get(arg.arg, [arg.arg]))
+                        new_name = self.rng.choice(self.identifiers.get(arg.arg, [arg.arg]))
                         if arg.arg not in self.old_names:
                             self.old_names[arg.arg] = new_name
                         arg.arg = new_name
@@ -59,50 +89,56 @@ class FuncVarNameRefactator:
                 # Shuffle parameters
                 if par_values:
                     shuffled_params = par_values.copy()
-                    random.shuffle(shuffled_params)
+                    self.rng.shuffle(shuffled_params)
                     temp = []
                     for arg in node.args.args:
                         new_param = shuffled_params.pop(0)
                         arg.arg = new_param
                         temp.append(new_param)
                     self.func_perm[node.name] = temp
+                    if temp != par_values:
+                        self.changed = True
 
-            elif isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+            elif rule == "identifier_assign":
                 # Mutate assignment targets
-                if (isinstance(node.value.func, ast.Attribute) and 
-                    len(node.targets) > 0 and 
-                    isinstance(node.targets[0], ast.Name) and 
-                    node.targets[0].id in self.code_identifiers and 
-                    node.targets[0].id not in self.old_names):
-                    method_choice = random.choice(self.identifiers.get(node.targets[0].id, [node.targets[0].id]))
-                    self.old_names[node.targets[0].id] = method_choice
-                    node.targets[0].id = method_choice
-
-            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                target = captures["target"]
+                if target.id not in self.old_names:
+                    method_choice = self.rng.choice(self.identifiers.get(target.id, [target.id]))
+                    self.old_names[target.id] = method_choice
+                    if method_choice != target.id:
+                        self.changed = True
+                    target.id = method_choice
+
+            else:
                 # Mutate cryptographic method calls
-                if node.func.attr == "new":
+                original_call = ast.dump(node)
+                if rule == "signer_new":
                     node.args = [arg for arg in node.args if not (
                         isinstance(arg, ast.Constant) and 
                         arg.value in ["fips-186-3", "rfc8032"]
                     )]
-                    method_choice = random.choice(self.algorithms['signatures'])
+                    method_choice = self.rng.choice(self.algorithms['signatures'])
                     node.func.value.id = method_choice
                     if method_choice == "DSS":
                         node.args.append(ast.Constant(value="fips-186-3"))
                     elif method_choice == "eddsa":
                         node.args.append(ast.Constant(value="rfc8032"))
-                elif node.func.attr == "generate":
-                    node.func.value.id = random.choice(self.key_types)
+                elif rule == "key_generate":
+                    node.func.value.id = self.rng.choice(self.key_types)
                     for kw in node.keywords:
                         if node.func.value.id == "ECC":
                             kw.arg = "curve"
-                            kw.value = ast.Constant(value=random.choice(self.ecc_key_sizes))
+                            kw.value = ast.Constant(value=self.rng.choice(self.ecc_key_sizes))
                     for arg in node.args:
                         if isinstance(arg, ast.Constant):
-                            arg.value = random.choice(self.ecc_key_sizes if node.func.value.id == "ECC" else self.key_sizes)
+                            arg.value = self.rng.choice(self.ecc_key_sizes if node.func.value.id == "ECC" else self.key_sizes)
+                if ast.dump(node) != original_call:
+                    self.changed = True
 
         for node in ast.walk(tree):
             if isinstance(node, ast.Name) and node.id in self.old_names:
+                if self.old_names[node.id] != node.id:
+                    self.changed = True
                 node.id = self.old_names[node.id]
 
         for node in ast.walk(tree):
@@ -115,39 +151,57 @@ class FuncVarNameRefactator:
                         new_args.append(node.args[idx])
                     else:
                         new_args.append(ast.Name(id=param, ctx=ast.Load()))
+                if new_args != node.args:
+                    self.changed = True
                 node.args = new_args
 
-        ast.fix_missing_locations(tree)
-        return ast.unparse(tree)
+        return self.finish(tree, source_code=source_code)
 
-    def crossover_code(self, code1, code2):
+    def crossover_code(self, code1, code2, *, rng=None):
         split1 = code1.split("\n")
         split2 = code2.split("\n")
-        crossover_point = random.randint(1, min(len(split1), len(split2)) - 1)
+        crossover_point = self.fork(rng).rng.randint(1, min(len(split1), len(split2)) - 1)
         return "\n".join(split1[:crossover_point] + split2[crossover_point:])
 
-    def generate_variants(self, initial_code, generations=2, population_size=2):
-        """Generate multiple code variants through mutation."""
+    def generate_variants(self, initial_code, generations=2, population_size=2, *, edit_scripts=False, rng=None):
+        """Generate multiple code variants through mutation.
+
+        With `edit_scripts=True` each variant is returned as an edit script
+        against `initial_code` (see VariantEditScript), carrying the rename
+        map and parameter permutations that produced it.
+        """
+        if edit_scripts and isinstance(initial_code, ast.AST):
+            initial_code = ast.unparse(initial_code)
+        elif edit_scripts and isinstance(initial_code, bytes):
+            initial_code = initial_code.decode("utf-8")
         population = [initial_code]
         final_population = []
+        scripts = VariantEditScript() if edit_scripts else None
+        worker = self.fork(rng)
 
         for _ in range(generations):
-            mutated_code = self.mutate_code(initial_code)
+            mutated_code = worker.apply_mutations(initial_code)
+            if edit_scripts:
+                mutated_code = scripts.create(initial_code, mutated_code, meta={
+                    "transform": type(self).__name__,
+                    "renames": {old: new for old, new in worker.old_names.items() if old != new},
+                    "permutations": {name: list(perm) for name, perm in worker.func_perm.items()},
+                })
             final_population.append(mutated_code)
 
             new_population = []
             while len(new_population) < population_size:
-                parent_code = random.choice(population)
-                mutated_code = self.mutate_code(parent_code)
+                parent_code = worker.rng.choice(population)
+                mutated_code = worker.apply_mutations(parent_code)
                 new_population.append(mutated_code)
 
             population = new_population
 
         return final_population
 
-    def get_refactored_code(self, source_code):
+    def get_refactored_code(self, source_code, *, rng=None):
         try:
             tree = ast.parse(source_code)
-            return self.generate_variants(tree)
+            return self.generate_variants(tree, rng=rng)
         except SyntaxError as e:
             raise ValueError(f"Syntax error in source code: {e}")
\ No newline at end of file
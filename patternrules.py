@@ -0,0 +1,208 @@
+class Node:
+    """AST shape: a node of `node_type` whose listed fields match their sub-patterns.
+
+    Field patterns may be another Node, a Capture, a OneOf, ANY, a literal
+    compared by equality, or a list of element patterns. A list matches a
+    field of exactly that length, unless it ends with `...`, in which case
+    it only has to match the leading elements.
+    """
+
+    def __init__(self, node_type, **fields):
+        self.node_type = node_type
+        self.fields = fields
+
+
+class Capture:
+    """Bind the value matched by `pattern` to `name` in the match result."""
+
+    def __init__(self, name, pattern=None):
+        self.name = name
+        self.pattern = ANY if pattern is None else pattern
+
+
+class OneOf:
+    """Match a literal value contained in `values`."""
+
+    def __init__(self, values):
+        self.values = frozenset(values)
+
+
+class _Any:
+    def __repr__(self):
+        return "ANY"
+
+
+ANY = _Any()  # Matches any value, including a missing one
+MISSING = object()
+
+
+class RuleSet:
+    """Match AST nodes against declared shapes with type-indexed dispatch.
+
+    Each rule is flattened into a sequence of tests (node path, kind, argument)
+    and the rules are merged into one decision tree per root node type.
+    Rules sharing a prefix share its evaluation, and a node is only tested
+    against the tree for its own type, so adding rules for other node types
+    costs nothing at traversal time. Equality and membership tests on the
+    same path are grouped into one dict lookup per branch. Declaration order
+    sets rule priority.
+    """
+
+    def __init__(self, rules=()):
+        self.roots = {}  # Maps root node types to decision tree roots
+        self.names = []  # Rule names, indexed by priority
+        for name, pattern in rules:
+            self.add(name, pattern)
+
+    @staticmethod
+    def new_branch(priority):
+        # "tests": every test key to its child, for merging rules with a shared prefix
+        # "checks": type/len/minlen tests to their child, evaluated one by one
+        # "lookups": path to {(type, value): [children]} for eq/in tests
+        # "best": highest priority (lowest index) of any rule below this branch
+        return {"tests": {}, "checks": {}, "lookups": {}, "rules": [], "best": priority}
+
+    def add(self, name, pattern):
+        """Compile `pattern` and merge it into the decision tree of its root type."""
+        captures = []
+        if isinstance(pattern, Capture):
+            captures.append((pattern.name, ()))
+            pattern = pattern.pattern
+        if not isinstance(pattern, Node):
+            raise ValueError(f"Rule {name!r} must be rooted at a Node pattern")
+
+        priority = len(self.names)
+        tests = []
+        self.compile(pattern, (), tests, captures)
+        branch = self.roots.setdefault(pattern.node_type, self.new_branch(priority))
+        for test in tests[1:]:  # The root type test is implied by the index
+            child = branch["tests"].get(test)
+            if child is None:
+                child = branch["tests"][test] = self.new_branch(priority)
+                path, kind, arg = test
+                if kind == "eq":
+                    branch["lookups"].setdefault(path, {}).setdefault(arg, []).append(child)
+                elif kind == "in":
+                    table = branch["lookups"].setdefault(path, {})
+                    for value in arg:
+                        table.setdefault(value, []).append(child)
+                else:
+                    branch["checks"][test] = child
+            branch = child
+        branch["rules"].append((priority, tuple(captures)))
+        self.names.append(name)
+
+    @staticmethod
+    def typed(value):
+        """Lookup key for a literal; the type keeps 1/True and 0/False apart."""
+        return (type(value), value)
+
+    def compile(self, pattern, path, tests, captures):
+        """Flatten a pattern into ordered tests; parents are always tested before children."""
+        if isinstance(pattern, Capture):
+            captures.append((pattern.name, path))
+            self.compile(pattern.pattern, path, tests, captures)
+        elif pattern is ANY:
+            return
+        elif isinstance(pattern, Node):
+            tests.append((path, "type", pattern.node_type))
+            for field, sub_pattern in pattern.fields.items():
+                self.compile(sub_pattern, path + (field,), tests, captures)
+        elif isinstance(pattern, OneOf):
+            tests.append((path, "in", frozenset(self.typed(value) for value in pattern.values)))
+        elif isinstance(pattern, list):
+            if pattern and pattern[-1] is Ellipsis:
+                pattern = pattern[:-1]
+                tests.append((path, "minlen", len(pattern)))
+            else:
+                tests.append((path, "len", len(pattern)))
+            for idx, sub_pattern in enumerate(pattern):
+                self.compile(sub_pattern, path + (idx,), tests, captures)
+        else:
+            tests.append((path, "eq", self.typed(pattern)))
+
+    @staticmethod
+    def resolve(node, path, cache):
+        """Return the value at `path` below `node`, memoised per match."""
+        value = cache.get(path, MISSING)
+        if value is MISSING:
+            parent = RuleSet.resolve(node, path[:-1], cache)
+            step = path[-1]
+            if isinstance(step, int):
+                value = parent[step] if isinstance(parent, list) and step < len(parent) else None
+            else:
+                value = getattr(parent, step, None)
+            cache[path] = value
+        return value
+
+    @staticmethod
+    def check(value, kind, arg):
+        if kind == "type":
+            return isinstance(value, arg)
+        if kind == "len":
+            return isinstance(value, list) and len(value) == arg
+        return isinstance(value, list) and len(value) >= arg
+
+    def children(self, branch, node, cache):
+        """Return the children of `branch` whose test `node` passes."""
+        passed = []
+        resolve = self.resolve
+        for (path, kind, arg), child in branch["checks"].items():
+            value = resolve(node, path, cache)
+            if isinstance(value, arg) if kind == "type" else self.check(value, kind, arg):
+                passed.append(child)
+        for path, table in branch["lookups"].items():
+            value = resolve(node, path, cache)
+            try:
+                passed.extend(table.get((type(value), value), ()))
+            except TypeError:  # Unhashable values equal no literal
+                pass
+        return passed
+
+    def captures(self, node, captures, cache):
+        return {name: self.resolve(node, path, cache) for name, path in captures}
+
+    def match_all(self, node):
+        """Return [(rule name, captures)] for every rule matching `node`, by priority."""
+        root = self.roots.get(type(node))
+        if root is None:
+            return []
+        cache = {(): node}
+        found = []
+        stack = [root]
+        while stack:
+            branch = stack.pop()
+            found.extend(branch["rules"])
+            stack.extend(self.children(branch, node, cache))
+        found.sort(key=lambda rule: rule[0])
+        return [(self.names[idx], self.captures(node, captures, cache)) for idx, captures in found]
+
+    def match(self, node):
+        """Return (rule name, captures) for the highest-priority matching rule, or None.
+
+        Branches whose best rule cannot beat the current hit are pruned, so the
+        search stops as soon as no pending branch can hold a better rule.
+        """
+        root = self.roots.get(type(node))
+        if root is None:
+            return None
+        cache = {(): node}
+        limit = len(self.names)  # Priority of the best hit so far
+        best = None
+        stack = [root]
+        while stack:
+            branch = stack.pop()
+            if branch["best"] >= limit:
+                continue
+            rules = branch["rules"]
+            if rules and rules[0][0] < limit:
+                best = rules[0]
+                limit = best[0]
+                if limit == branch["best"]:  # Nothing below this branch can beat it
+                    continue
+            for child in self.children(branch, node, cache):
+                if child["best"] < limit:
+                    stack.append(child)
+        if best is None:
+            return None
+        return self.names[best[0]], self.captures(node, best[1], cache)
@@ -0,0 +1,497 @@
+import ast
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from funcvaridentifier import FuncVarNameRefactator
+from refactorbase import ReentrantRefactor
+
+class ProjectRefactor(ReentrantRefactor):
+    def __init__(self, workers=None):
+        self.identifiers = FuncVarNameRefactator().identifiers
+        self.workers = workers  # Process pool size, None lets the executor decide
+        self.reset_state()
+
+    def reset_state(self):
+        self.index = {}         # Maps module names to per-file index entries
+        self.refs = {}          # Maps module names to that file's module_refs()
+        self.importers = {}     # Maps (module, function) or module to the modules referencing it
+        self.star_importers = {}  # Maps module names to the modules that `import *` from them
+        self.plans = {}         # Maps (module, function) to the rewrite plan
+        self.module_plans = {}  # Maps module names to {function name: plan}
+
+    @staticmethod
+    def module_name(root, path):
+        """Derive the dotted module name of a file relative to the project root."""
+        rel = os.path.splitext(os.path.relpath(path, root))[0]
+        parts = rel.split(os.sep)
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        return ".".join(parts)
+
+    @staticmethod
+    def resolve_import(module, is_package, node_module, level):
+        """Resolve a possibly relative `from ... import` to an absolute module name."""
+        if not level:
+            return node_module
+        parts = module.split(".") if module else []
+        if not is_package:
+            parts = parts[:-1]
+        if level > 1:
+            parts = parts[:len(parts) - (level - 1)]
+        if node_module:
+            parts.append(node_module)
+        return ".".join(parts)
+
+    @staticmethod
+    def dotted_name(node):
+        """Return `a.b.c` for a Name/Attribute chain, or None for anything else."""
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            prefix = ProjectRefactor.dotted_name(node.value)
+            return f"{prefix}.{node.attr}" if prefix else None
+        return None
+
+    @staticmethod
+    def index_file(job):
+        """Build the symbol and call-site index for one file (runs in a worker)."""
+        root, path = job
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        try:
+            tree = ast.parse(source)
+        except SyntaxError as e:
+            raise ValueError(f"Syntax error in {path}: {e}")
+
+        module = ProjectRefactor.module_name(root, path)
+        is_package = os.path.basename(path) == "__init__.py"
+        entry = {
+            "path": path,
+            "module": module,
+            "functions": {},       # Top-level function name -> signature info
+            "imports": {},         # Local name -> (module, name) for `from m import n`
+            "module_aliases": {},  # Local (dotted) name -> module for `import m` / `import a.b`
+            "star_imports": set(), # Modules imported with `from m import *`
+            "all": None,           # Names listed in a literal top-level `__all__`, if any
+            "names": set(),        # Every identifier bound or used in the file
+            "value_names": set(),  # Names loaded other than as the callee of a call
+            "value_attrs": set(),  # (dotted prefix, attr) loaded other than as a callee
+        }
+
+        callees = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                entry["names"].add(node.id)
+                if isinstance(node.ctx, ast.Load) and id(node) not in callees:
+                    entry["value_names"].add(node.id)
+            elif isinstance(node, ast.Attribute):
+                prefix = ProjectRefactor.dotted_name(node.value)
+                if prefix and isinstance(node.ctx, ast.Load) and id(node) not in callees:
+                    entry["value_attrs"].add((prefix, node.attr))
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                entry["names"].add(node.name)
+            elif isinstance(node, ast.arg):
+                entry["names"].add(node.arg)
+            elif isinstance(node, ast.ImportFrom):
+                source_module = ProjectRefactor.resolve_import(module, is_package, node.module, node.level)
+                for alias in node.names:
+                    if alias.name == "*":
+                        entry["star_imports"].add(source_module)
+                    else:
+                        entry["imports"][alias.asname or alias.name] = (source_module, alias.name)
+                        entry["names"].add(alias.asname or alias.name)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        entry["module_aliases"][alias.asname] = alias.name
+                        entry["names"].add(alias.asname)
+                    else:
+                        entry["module_aliases"][alias.name] = alias.name
+                        entry["names"].add(alias.name.split(".")[0])
+
+        for stmt in tree.body:
+            if isinstance(stmt, ast.FunctionDef):
+                entry["functions"][stmt.name] = ProjectRefactor.index_function(stmt)
+            elif (isinstance(stmt, ast.Assign) and isinstance(stmt.value, (ast.List, ast.Tuple)) and
+                  any(isinstance(t, ast.Name) and t.id == "__all__" for t in stmt.targets)):
+                entry["all"] = {elt.value for elt in stmt.value.elts
+                                if isinstance(elt, ast.Constant) and isinstance(elt.value, str)}
+        return entry
+
+    @staticmethod
+    def index_function(node):
+        """Record the signature of a function and the constant call arguments it could lift."""
+        params = [arg.arg for arg in node.args.args]
+        local_names = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+        local_names.update(n.arg for n in ast.walk(node) if isinstance(n, ast.arg))
+        info = {
+            "params": params,
+            "required": len(params) - len(node.args.defaults),
+            "shuffle_ok": not node.args.posonlyargs,
+            "local_names": local_names,
+            "lifted": [],  # (stmt index, "arg" | "kw", position or keyword, parameter, value)
+        }
+
+        # Same shape as AddDefaultArgValue.collect_mappings: constants in `x = f(...)` calls
+        if node.args.vararg is None:
+            var_idx = 0
+            for stmt_idx, stmt in enumerate(node.body):
+                if not (isinstance(stmt, ast.Assign) and isinstance(stmt.value, ast.Call)):
+                    continue
+                for arg_idx, arg in enumerate(stmt.value.args):
+                    if isinstance(arg, ast.Constant):
+                        while f"var{var_idx}" in local_names:
+                            var_idx += 1
+                        var_name = f"var{var_idx}"
+                        local_names.add(var_name)
+                        info["lifted"].append((stmt_idx, "arg", arg_idx, var_name, arg.value))
+                for kw in stmt.value.keywords:
+                    if isinstance(kw.value, ast.Constant) and kw.arg and kw.arg not in local_names:
+                        local_names.add(kw.arg)
+                        info["lifted"].append((stmt_idx, "kw", kw.arg, kw.arg, kw.value.value))
+        return info
+
+    def build_index(self, root):
+        """Index every Python file under `root` in parallel."""
+        jobs = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    jobs.append((root, os.path.join(dirpath, filename)))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            entries = list(executor.map(ProjectRefactor.index_file, jobs))
+        self.index = {entry["module"]: entry for entry in entries}
+        self.link_index()
+        return self.index
+
+    def link_index(self):
+        """Build the reverse lookups used for planning, in one pass over the index."""
+        self.refs = {module: self.module_refs(entry) for module, entry in self.index.items()}
+        self.importers = {}
+        self.star_importers = {}
+        for module, entry in self.index.items():
+            targets = set(entry["imports"].values()) | set(self.refs[module].values())
+            for target in targets:
+                self.importers.setdefault(target, set()).add(module)
+            for source in entry["star_imports"]:
+                self.star_importers.setdefault(source, set()).add(module)
+
+    def module_refs(self, entry):
+        """Map local dotted names in a file to the project modules they refer to.
+
+        Covers `import a.b`, `import a.b as m` and `from a import b` where
+        `a.b` is itself a module of the project.
+        """
+        refs = {alias: module for alias, module in entry["module_aliases"].items()
+                if module in self.index}
+        for local_name, (module, name) in entry["imports"].items():
+            submodule = f"{module}.{name}" if module else name
+            if submodule in self.index:
+                refs[local_name] = submodule
+        return refs
+
+    def importers_of(self, module, name):
+        """Yield index entries that reference `module.name` from another module."""
+        modules = self.importers.get((module, name), set()) | self.importers.get(module, set())
+        for importer in sorted(modules - {module}):
+            yield self.index[importer]
+
+    def star_exported(self, module, name):
+        """Check whether `module.name` reaches other modules through `from module import *`.
+
+        Those modules use the name without importing it explicitly, so the
+        function is never renamed and its signature never changed.
+        """
+        if not self.star_importers.get(module, set()) - {module}:
+            return False
+        exported = self.index[module]["all"]
+        return name in exported if exported is not None else not name.startswith("_")
+
+    def used_as_value(self, module, name):
+        """Check whether `module.name` is referenced anywhere other than as a callee.
+
+        Calls made through such references (e.g. `handlers[0](...)`) cannot be
+        rewritten, so the signature of these functions must stay as it is.
+        """
+        entry = self.index[module]
+        if name in entry["value_names"] or self.star_exported(module, name):
+            return True
+        for importer in self.importers_of(module, name):
+            for local_name, target in importer["imports"].items():
+                if target == (module, name) and local_name in importer["value_names"]:
+                    return True
+            for alias, target in self.refs[importer["module"]].items():
+                if target == module and (alias, name) in importer["value_attrs"]:
+                    return True
+        return False
+
+    def plan_changes(self):
+        """Choose renames, permutations and lifted defaults once for the whole project."""
+        self.plans = {}
+        for module, entry in self.index.items():
+            taken = set(entry["names"])
+            for name, info in entry["functions"].items():
+                forbidden = taken.copy()
+                for importer in self.importers_of(module, name):
+                    forbidden.update(importer["names"])
+
+                new_name = self.rng.choice(self.identifiers.get(name, [name]))
+                if new_name != name and (new_name in forbidden or self.star_exported(module, name)):
+                    new_name = name
+                taken.add(new_name)
+
+                param_renames = {}
+                as_value = self.used_as_value(module, name)
+                for param in ([] if as_value else info["params"]):
+                    new_param = self.rng.choice(self.identifiers.get(param, [param]))
+                    if new_param != param and new_param not in info["local_names"] \
+                            and new_param not in param_renames.values():
+                        param_renames[param] = new_param
+
+                new_params = info["params"].copy()
+                if info["shuffle_ok"] and info["required"] > 1 and not as_value:
+                    required = new_params[:info["required"]]
+                    self.rng.shuffle(required)
+                    new_params[:info["required"]] = required
+
+                if (new_name == name and not param_renames and
+                        new_params == info["params"] and not info["lifted"]):
+                    continue
+                self.plans[(module, name)] = {
+                    "name": name,
+                    "new_name": new_name,
+                    "params": info["params"],
+                    "new_params": new_params,
+                    "required": info["required"],
+                    "param_renames": param_renames,
+                    "lifted": info["lifted"],
+                }
+        self.module_plans = {}
+        for (module, name), plan in self.plans.items():
+            self.module_plans.setdefault(module, {})[name] = plan
+        return self.plans
+
+    def file_job(self, entry):
+        """Collect the plans a file needs, or None if the file is unaffected."""
+        local = self.module_plans.get(entry["module"], {})
+        imported = {}
+        for local_name, target in entry["imports"].items():
+            if target in self.plans:
+                imported[local_name] = self.plans[target]
+        aliased = {}
+        for alias, module in self.refs[entry["module"]].items():
+            if module in self.module_plans:
+                aliased[alias] = self.module_plans[module]
+        if not (local or imported or aliased):
+            return None
+        return entry["path"], local, imported, aliased
+
+    @staticmethod
+    def rewrite_file(job):
+        """Apply the project plans to one affected file (runs in a worker)."""
+        path, local, imported, aliased = job
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+
+        rewriter = ProjectCallRewriter(local, imported, aliased)
+        rewriter.visit(tree)
+        ast.fix_missing_locations(tree)
+        return path, ast.unparse(tree)
+
+    def refactor_project(self, root, output_dir=None, *, rng=None):
+        """Index `root`, rewrite only the affected files and return {path: new source}.
+
+        When `output_dir` is given the rewritten files are written there, mirroring
+        their location under `root` (pass `root` itself to rewrite in place).
+        """
+        worker = self.fork(rng)
+        worker.build_index(root)
+        worker.plan_changes()
+        jobs = [job for job in map(worker.file_job, worker.index.values()) if job is not None]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(executor.map(ProjectRefactor.rewrite_file, jobs))
+
+        if output_dir is not None:
+            for path, code in results.items():
+                out_path = os.path.join(output_dir, os.path.relpath(path, root))
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                with open(out_path, "w", encoding="utf-8") as f:
+                    f.write(code + "\n")
+        return results
+
+
+class ProjectCallRewriter(ast.NodeTransformer):
+    def __init__(self, local, imported, aliased):
+        self.local = local        # Plans for functions defined in this module
+        self.imported = imported  # Maps from-imported local names to plans
+        self.aliased = aliased    # Maps dotted module references to {function name: plan}
+        self.top_level = set()    # Top-level FunctionDef nodes of the module being rewritten
+        self.shadowed = frozenset()  # Names rebound by the enclosing function/lambda/comprehension scopes
+        self.renames = {name: plan["new_name"] for name, plan in local.items()}
+        for local_name, plan in imported.items():
+            if local_name == plan["name"]:  # `from m import f`; aliased imports keep their alias
+                self.renames[local_name] = plan["new_name"]
+
+    def lift_defaults(self, node, plan):
+        """Turn constant call arguments into new parameters with default values."""
+        for stmt_idx, kind, position, param, value in plan["lifted"]:
+            call = node.body[stmt_idx].value
+            if kind == "arg":
+                call.args[position] = ast.Name(id=param, ctx=ast.Load())
+            else:
+                for kw in call.keywords:
+                    if kw.arg == position:
+                        kw.value = ast.Name(id=param, ctx=ast.Load())
+            node.args.args.append(ast.arg(arg=param))
+            node.args.defaults.append(ast.Constant(value=value))
+
+    @staticmethod
+    def local_bindings(node):
+        """Names a function, lambda or comprehension binds in its own scope."""
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            return {sub.id for gen in node.generators for sub in ast.walk(gen.target)
+                    if isinstance(sub, ast.Name)}
+        args = node.args
+        names = {arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs}
+        names.update(arg.arg for arg in (args.vararg, args.kwarg) if arg is not None)
+        if isinstance(node, ast.Lambda):
+            return names
+
+        declared = set()
+        stack = list(node.body)
+        while stack:
+            sub = stack.pop()
+            if isinstance(sub, (ast.Global, ast.Nonlocal)):
+                declared.update(sub.names)
+                continue
+            if isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(sub.name)  # Its own body is a separate scope
+                continue
+            if isinstance(sub, (ast.Lambda, ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+                continue
+            if isinstance(sub, ast.Name) and not isinstance(sub.ctx, ast.Load):
+                names.add(sub.id)
+            elif isinstance(sub, ast.alias):
+                names.add((sub.asname or sub.name).split(".")[0])
+            elif isinstance(sub, ast.ExceptHandler) and sub.name:
+                names.add(sub.name)
+            stack.extend(ast.iter_child_nodes(sub))
+        return names - declared
+
+    def visit_scope(self, node, inner_fields):
+        """Visit a scope node; names it binds shadow module names in `inner_fields` only.
+
+        Decorators, defaults and annotations stay in the enclosing scope.
+        """
+        outer = self.shadowed
+        inner = outer | self.local_bindings(node)
+        for field, value in ast.iter_fields(node):
+            self.shadowed = inner if field in inner_fields else outer
+            if isinstance(value, list):
+                value[:] = [self.visit(item) if isinstance(item, ast.AST) else item for item in value]
+            elif isinstance(value, ast.AST):
+                setattr(node, field, self.visit(value))
+        self.shadowed = outer
+        return node
+
+    def visit_Lambda(self, node):
+        return self.visit_scope(node, ("body",))
+
+    def visit_AsyncFunctionDef(self, node):
+        return self.visit_scope(node, ("body",))
+
+    def visit_ListComp(self, node):
+        """The first iterable of a comprehension is evaluated in the enclosing scope."""
+        first = node.generators[0]
+        first.iter = self.visit(first.iter)
+        iterable, first.iter = first.iter, ast.Constant(value=None)
+        self.visit_scope(node, ("elt", "key", "value", "generators"))
+        first.iter = iterable
+        return node
+
+    visit_SetComp = visit_GeneratorExp = visit_DictComp = visit_ListComp
+
+    def visit_FunctionDef(self, node):
+        """Rename, shuffle and extend the signature of planned top-level functions."""
+        plan = self.local.get(node.name)
+        if plan is not None and node in self.top_level:
+            by_name = {arg.arg: arg for arg in node.args.args}
+            node.args.args = [by_name[param] for param in plan["new_params"]] + \
+                node.args.args[len(plan["params"]):]
+            self.lift_defaults(node, plan)
+
+            renames = plan["param_renames"]
+            for arg in node.args.args:
+                arg.arg = renames.get(arg.arg, arg.arg)
+            for sub in ast.walk(node):
+                if isinstance(sub, ast.Name) and sub.id in renames:
+                    sub.id = renames[sub.id]
+            node.name = plan["new_name"]
+        return self.visit_scope(node, ("body",))
+
+    def visit_Module(self, node):
+        self.top_level = {stmt for stmt in node.body if isinstance(stmt, ast.FunctionDef)}
+        return self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        """Point `from m import f` at the renamed function."""
+        for alias in node.names:
+            plan = self.imported.get(alias.asname or alias.name)
+            if plan is not None and alias.name == plan["name"]:
+                alias.name = plan["new_name"]
+        return node
+
+    def visit_Name(self, node):
+        if node.id in self.renames and node.id not in self.shadowed:
+            node.id = self.renames[node.id]
+        return node
+
+    def module_funcs(self, node):
+        """Return {function name: plan} if `node` refers to a planned module, else None."""
+        dotted = ProjectRefactor.dotted_name(node)
+        if dotted is None or dotted.split(".")[0] in self.shadowed:
+            return None
+        return self.aliased.get(dotted)
+
+    def visit_Attribute(self, node):
+        """Rename `alias.f` and `a.b.f` references to functions of a referenced module."""
+        funcs = self.module_funcs(node.value)
+        if funcs is not None and node.attr in funcs:
+            node.attr = funcs[node.attr]["new_name"]
+        return self.generic_visit(node)
+
+    def plan_for_call(self, func):
+        """Find the plan of the function a call targets, if any."""
+        if isinstance(func, ast.Name):
+            if func.id in self.shadowed:
+                return None
+            if func.id in self.local:
+                return self.local[func.id]
+            return self.imported.get(func.id)
+        if isinstance(func, ast.Attribute):
+            funcs = self.module_funcs(func.value)
+            if funcs is not None:
+                return funcs.get(func.attr)
+        return None
+
+    def visit_Call(self, node):
+        """Reorder positional arguments and rename keywords at planned call sites."""
+        plan = self.plan_for_call(node.func)
+        if plan is not None and not any(isinstance(arg, ast.Starred) for arg in node.args):
+            params = plan["params"]
+            if len(node.args) >= plan["required"]:
+                old_args = node.args
+                node.args = [old_args[params.index(param)] for param in plan["new_params"][:plan["required"]]]
+                node.args += old_args[plan["required"]:]
+            else:
+                # Some required parameters are passed by keyword; pass all of them that way
+                node.keywords = [ast.keyword(arg=params[idx], value=arg)
+                                 for idx, arg in enumerate(node.args)] + node.keywords
+                node.args = []
+            for kw in node.keywords:
+                if kw.arg in plan["param_renames"]:
+                    kw.arg = plan["param_renames"][kw.arg]
+        return self.generic_visit(node)
@@ -0,0 +1,48 @@
+import ast
+import copy
+import random
+
+class RefactoredCode(str):
+    """Refactored source text that also reports whether the refactorer changed anything."""
+
+    def __new__(cls, code, changed=True):
+        obj = super().__new__(cls, code)
+        obj.changed = changed
+        return obj
+
+
+class ReentrantRefactor:
+    """Mixin that runs every refactoring call on its own context.
+
+    The shared instance only holds configuration and is never written to
+    during a run. Each entry point works on a `fork()`: a shallow copy with
+    fresh per-run state and its own `random.Random`. One instance can
+    therefore serve many threads at once.
+    """
+
+    rng = random  # Direct, non-forked use keeps drawing from the global generator
+    changed = False
+
+    def reset_state(self):
+        """Initialise per-run state; refactorers with state override this."""
+
+    def fork(self, rng=None):
+        """Return a worker copy with fresh state.
+
+        `rng` may be a `random.Random` to share with the caller, a seed, or
+        None for an independently seeded generator.
+        """
+        worker = copy.copy(self)
+        worker.rng = rng if isinstance(rng, random.Random) else random.Random(rng)
+        worker.changed = False  # Set by the transformer whenever it modifies the tree
+        worker.reset_state()
+        return worker
+
+    def finish(self, tree, *, source_code=None):
+        """Unparse `tree`, or hand back `source_code` untouched when nothing changed."""
+        if not self.changed and isinstance(source_code, (str, bytes)):
+            if isinstance(source_code, bytes):
+                source_code = source_code.decode("utf-8")
+            return RefactoredCode(source_code, changed=False)
+        ast.fix_missing_locations(tree)
+        return RefactoredCode(ast.unparse(tree), changed=self.changed)
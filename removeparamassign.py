@@ -1,8 +1,13 @@
 import ast
 import os
 
-class ParameterRenameRefactor(ast.NodeTransformer):
+from refactorbase import ReentrantRefactor
+
+class ParameterRenameRefactor(ast.NodeTransformer, ReentrantRefactor):
     def __init__(self):
+        self.reset_state()
+
+    def reset_state(self):
         self.par_var_map = {}  # Maps original parameters to new variable names
         self.current_func = None  # Tracks current FunctionDef being processed
 
@@ -48,6 +53,7 @@ class ParameterRenameRefactor(ast.NodeTransformer):
                         var_name = f"var{var_idx}"
                         var_idx += 1
                         self.par_var_map[target.id] = var_name
+                        self.changed = True
                         new_targets.append(ast.Name(id=var_name, ctx=target.ctx))
                     else:
                         new_targets.append(target)
@@ -76,14 +82,14 @@ class ParameterRenameRefactor(ast.NodeTransformer):
         self.current_func = None
         return self.generic_visit(node)
 
-    def refactor_parameters(self, tree):
-        self.visit(tree)
-        ast.fix_missing_locations(tree)
-        return ast.unparse(tree)
+    def refactor_parameters(self, tree, *, source_code=None):
+        worker = self.fork()
+        worker.visit(tree)
+        return worker.finish(tree, source_code=source_code)
 
     def get_refactored_code(self, source_code):
         try:
             tree = ast.parse(source_code)
-            return self.refactor_parameters(tree)
+            return self.refactor_parameters(tree, source_code=source_code)
         except SyntaxError as e:
             raise ValueError(f"Syntax error in source code: {e}")
@@ -0,0 +1,105 @@
+import io
+import json
+import os
+
+import pytest
+
+from addexception import TryExceptRefactor
+from editscript import VariantEditScript
+from funcvaridentifier import FuncVarNameRefactator
+from tryexcept import ErrorHandlerRefactor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CRYPTO = '''
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+from Crypto.Hash import SHA256
+
+def keygen():
+    key = RSA.generate(2048)
+    public_key = key.publickey()
+    return key, public_key
+
+def sign(key, message):
+    h = SHA256.new(message)
+    signature = pkcs1_15.new(key).sign(h)
+    return signature
+
+def verify(public_key, message, signature):
+    h = SHA256.new(message)
+    verifier = pkcs1_15.new(public_key)
+    try:
+        verifier.verify(h, signature)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+def stub(key: ..., message=b"m"):
+    ...
+
+key, public_key = keygen()
+signature = sign(key, b"data")
+print(verify(public_key, b"data", signature), stub(key)[...])
+'''
+
+
+def samples():
+    sources = {"crypto": CRYPTO}
+    for name in ("test1", "test2", "test3", "test4"):
+        with open(os.path.join(HERE, f"{name}.py"), "r", encoding="utf-8") as f:
+            sources[name] = f.read()
+    return sources
+
+
+SAMPLES = samples()
+
+
+def reload(script):
+    """Serialize and parse a script, as when it is stored in a JSONL dataset."""
+    return json.loads(VariantEditScript.dumps(script))
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLES))
+@pytest.mark.parametrize("refactor, method", [
+    (TryExceptRefactor, "get_refactored_code"),
+    (ErrorHandlerRefactor, "get_refacctored_code"),
+])
+def test_single_variant_round_trip(name, refactor, method):
+    base = SAMPLES[name]
+    text = getattr(refactor(), method)(base, rng=3)
+    script = reload(refactor().get_edit_script(base, rng=3))
+    assert VariantEditScript().materialize(script, base) == text
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLES))
+def test_variants_round_trip(name):
+    base = SAMPLES[name]
+    texts = FuncVarNameRefactator().generate_variants(base, generations=4, rng=7)
+    scripts = [reload(script) for script in
+               FuncVarNameRefactator().generate_variants(base, generations=4, edit_scripts=True, rng=7)]
+
+    assert VariantEditScript().materialize_all(scripts, base) == texts
+    sink = io.StringIO()
+    VariantEditScript().materialize_all(scripts, base, sink=sink)
+    assert sink.getvalue() == "".join(text + "\n" for text in texts)
+
+
+def test_unchanged_variant_is_the_base_text():
+    base = "# comment kept\nx = 1\n"
+    script = reload(TryExceptRefactor().get_edit_script(base, rng=0))
+    assert script["tree"] == VariantEditScript.IDENTITY
+    assert VariantEditScript().materialize(script, base) == base
+
+
+def test_script_for_other_base_is_rejected():
+    script = reload(TryExceptRefactor().get_edit_script(SAMPLES["test1"], rng=3))
+    with pytest.raises(ValueError):
+        VariantEditScript().materialize(script, SAMPLES["test2"])
+
+
+def test_non_json_constants_round_trip():
+    base = "x = 1\ny = b'a'\nz = 2\n"
+    variant = "x = ...\ny = b'b'\nz = 2j\n"
+    script = reload(VariantEditScript().create(base, variant))
+    assert VariantEditScript().materialize(script, base) == variant.rstrip("\n")
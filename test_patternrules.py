@@ -0,0 +1,95 @@
+import ast
+
+import pytest
+
+from patternrules import ANY, Capture, Node, OneOf, RuleSet
+
+
+def expr(source):
+    return ast.parse(source, mode="eval").body
+
+
+def stmt(source):
+    return ast.parse(source).body[0]
+
+
+def test_declaration_order_sets_priority():
+    rules = RuleSet([
+        ("specific", Node(ast.Call, func=Node(ast.Attribute, attr="new"))),
+        ("attribute_call", Node(ast.Call, func=Node(ast.Attribute))),
+        ("any_call", Node(ast.Call)),
+    ])
+    assert rules.match(expr("pss.new(key)"))[0] == "specific"
+    assert rules.match(expr("pss.sign(h)"))[0] == "attribute_call"
+    assert rules.match(expr("sign(h)"))[0] == "any_call"
+    assert rules.match(expr("x")) is None
+
+    # A later, more specific rule never beats an earlier general one
+    rules = RuleSet([("any_call", Node(ast.Call)),
+                     ("specific", Node(ast.Call, func=Node(ast.Attribute, attr="new")))])
+    assert rules.match(expr("pss.new(key)"))[0] == "any_call"
+
+
+def test_literals_are_matched_by_type():
+    rules = RuleSet([
+        ("one", Node(ast.Constant, value=1)),
+        ("true", Node(ast.Constant, value=True)),
+        ("int_zero_or_one", Node(ast.Constant, value=OneOf([0, 1]))),
+        ("false", Node(ast.Constant, value=OneOf([False]))),
+        ("constant", Node(ast.Constant)),
+    ])
+    assert [name for name, _ in rules.match_all(expr("1"))] == ["one", "int_zero_or_one", "constant"]
+    assert [name for name, _ in rules.match_all(expr("True"))] == ["true", "constant"]
+    assert [name for name, _ in rules.match_all(expr("0"))] == ["int_zero_or_one", "constant"]
+    assert [name for name, _ in rules.match_all(expr("False"))] == ["false", "constant"]
+    assert [name for name, _ in rules.match_all(expr("1.0"))] == ["constant"]
+
+
+def test_list_patterns_and_captures():
+    rules = RuleSet([
+        ("exact", Node(ast.Call, args=[Capture("only", Node(ast.Name))])),
+        ("at_least_two", Node(ast.Call, args=[ANY, Capture("second", Node(ast.Name)), ...])),
+    ])
+    name, captures = rules.match(expr("f(a)"))
+    assert name == "exact" and captures["only"].id == "a"
+    name, captures = rules.match(expr("f(1, b, c)"))
+    assert name == "at_least_two" and captures["second"].id == "b"
+    assert rules.match(expr("f(1, 2)")) is None
+    assert rules.match(expr("f()")) is None
+
+
+def test_root_capture_and_unhashable_values():
+    rules = RuleSet([("assign", Capture("stmt", Node(ast.Assign, targets=OneOf(["x"]))))])
+    node = stmt("x = 1")
+    assert rules.match(node) is None  # targets is a list, never equal to a literal
+    rules = RuleSet([("assign", Capture("stmt", Node(ast.Assign)))])
+    assert rules.match(node) == ("assign", {"stmt": node})
+
+    with pytest.raises(ValueError):
+        RuleSet([("bad", Capture("x"))])
+
+
+@pytest.mark.parametrize("source", [
+    "pss.new(key)", "DSS.new(key, 'fips-186-3')", "RSA.generate(2048)", "f(1, b, c)",
+    "sig = pkcs1_15.new(key).sign(h)", "signer = pss.new(key)", "ok = v.verify(h, s)",
+    "x = True", "x = 1", "while i < len(x): pass",
+])
+def test_match_agrees_with_match_all(source):
+    rules = RuleSet([
+        ("chained", Node(ast.Assign, value=Node(ast.Call, func=Node(
+            ast.Attribute, value=Node(ast.Call, func=Node(
+                ast.Attribute, value=Node(ast.Name, id=OneOf(["pkcs1_15", "pss"])))))))),
+        ("definition", Node(ast.Assign, value=Node(ast.Call, func=Node(
+            ast.Attribute, value=Node(ast.Name, id=OneOf(["pkcs1_15", "pss"])))))),
+        ("method", Node(ast.Assign, value=Node(ast.Call, func=Node(
+            ast.Attribute, attr=OneOf(["sign", "verify"]))))),
+        ("flag", Node(ast.Assign, value=Node(ast.Constant, value=True))),
+        ("assign", Node(ast.Assign)),
+        ("new", Node(ast.Call, func=Node(ast.Attribute, attr="new"))),
+        ("generate", Node(ast.Call, func=Node(ast.Attribute, attr="generate"))),
+        ("two_args", Node(ast.Call, args=[ANY, ANY, ...])),
+        ("while", Node(ast.While, test=Node(ast.Compare))),
+    ])
+    for node in ast.walk(ast.parse(source)):
+        matches = rules.match_all(node)
+        assert rules.match(node) == (matches[0] if matches else None)
@@ -0,0 +1,128 @@
+import ast
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from projectrefactor import ProjectRefactor
+
+FIXTURE = {
+    "pkg/__init__.py": "",
+    "pkg/crypto.py": '''
+def sign(key, message, salt=3):
+    digest = combine(key, message, "x")
+    return digest + str(salt)
+
+def verify(public_key, message, signature):
+    return sign(public_key, message) == signature
+
+def combine(a, b, sep):
+    return f"{a}{sep}{b}"
+
+double = lambda verify: verify * 2
+
+def twice(combine):
+    return [combine for combine in (combine, combine)]
+
+def outer(x):
+    def verify(y):
+        return y + 1
+    return verify(x)
+''',
+    "pkg/legacy.py": '''
+def verify(a, b):
+    return a - b
+''',
+    "starred.py": '''
+from pkg.legacy import *
+
+def run():
+    return verify(5, 2)
+''',
+    "pkg/sub/__init__.py": "",
+    "pkg/sub/tools.py": '''
+from ..crypto import combine
+
+def keygen(size, seed):
+    return combine(size, seed, "-")
+''',
+    "main.py": '''
+from pkg.crypto import sign
+from pkg.crypto import verify as check
+from pkg import crypto
+import pkg.crypto
+import pkg.crypto as pc
+from pkg.sub import tools
+import pkg.sub.tools
+import starred
+
+handlers = [check]
+
+def run():
+    s = sign("k", "m")
+    return [
+        s,
+        check("k", "m", s),
+        crypto.sign("a", "b"),
+        pkg.crypto.sign("c", "d", 5),
+        pc.verify("k", "m", signature=s),
+        sign("k", message="m"),
+        handlers[0]("k", "m", s),
+        tools.keygen(1, 2),
+        pkg.sub.tools.keygen(3, seed=4),
+        crypto.combine("p", b="q", sep="+"),
+        crypto.double(3),
+        crypto.twice(1),
+        crypto.outer(1),
+        starred.run(),
+    ]
+''',
+}
+
+
+def write_fixture(root):
+    for rel, code in FIXTURE.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+
+
+def run_main(root):
+    result = subprocess.run([sys.executable, "-c", "import main; print(main.run())"],
+                            cwd=root, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_project_rewrite_keeps_behaviour(tmp_path, seed):
+    original = str(tmp_path / "original")
+    rewritten = str(tmp_path / "rewritten")
+    write_fixture(original)
+    shutil.copytree(original, rewritten)
+
+    results = ProjectRefactor(workers=2).refactor_project(rewritten, output_dir=rewritten, rng=seed)
+
+    assert run_main(rewritten) == run_main(original)
+    crypto = ast.parse(results[os.path.join(rewritten, "pkg", "crypto.py")])
+    names = [node.name for node in crypto.body if isinstance(node, ast.FunctionDef)]
+    assert "sign" not in names
+    # Functions reaching other modules through `import *` keep their name and signature
+    assert os.path.join(rewritten, "pkg", "legacy.py") not in results
+
+
+def test_function_used_as_value_keeps_signature(tmp_path):
+    write_fixture(str(tmp_path))
+    refactor = ProjectRefactor(workers=1).fork(0)
+    refactor.build_index(str(tmp_path))
+    plans = refactor.plan_changes()
+
+    verify = plans[("pkg.crypto", "verify")]
+    assert verify["new_params"] == verify["params"]
+    assert verify["param_renames"] == {}
+    assert refactor.used_as_value("pkg.crypto", "verify")
+    assert not refactor.used_as_value("pkg.crypto", "sign")
+    assert refactor.used_as_value("pkg.legacy", "verify")
+    assert ("pkg.legacy", "verify") not in plans
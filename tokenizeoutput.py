@@ -0,0 +1,185 @@
+import ast
+import json
+import os
+import re
+import sys
+import zipfile
+from array import array
+
+from funcvaridentifier import FuncVarNameRefactator
+
+class TokenizedOutput:
+    # GPT-2 style pre-tokenization; `_` is grouped with punctuation as in \p{L}/\p{N} splitting
+    PRETOKENIZE_PATTERN = re.compile(
+        r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+"""
+    )
+
+    def __init__(self, vocab_path, merges_path, eos_token=None, cache_size=65536):
+        self.encoder = {}       # Maps token strings to token IDs
+        self.bpe_ranks = {}     # Maps merge pairs to their priority
+        self.pinned = {}        # Maps identifier-pool pieces to token ID tuples, never evicted
+        self.cache = {}         # Maps other pre-tokenized pieces to token ID tuples
+        self.cache_size = cache_size  # Oldest entries are evicted beyond this many pieces
+        self.byte_encoder = self.bytes_to_unicode()
+        self.eos_id = None
+
+        with open(vocab_path, "r", encoding="utf-8") as f:
+            self.encoder = json.load(f)
+        with open(merges_path, "r", encoding="utf-8") as f:
+            rank = 0
+            for line in f:
+                line = line.rstrip("\n")
+                if not line or line.startswith("#version"):
+                    continue
+                pair = tuple(line.split(" "))
+                if len(pair) != 2:
+                    raise ValueError(f"Malformed merge rule: {line!r}")
+                self.bpe_ranks[pair] = rank
+                rank += 1
+
+        if eos_token is not None:
+            if eos_token not in self.encoder:
+                raise ValueError(f"EOS token not in vocabulary: {eos_token!r}")
+            self.eos_id = self.encoder[eos_token]
+
+        self.warm_cache()
+
+    @staticmethod
+    def bytes_to_unicode():
+        """Map every byte to a printable unicode character (byte-level BPE alphabet)."""
+        byte_values = (list(range(ord("!"), ord("~") + 1)) +
+                       list(range(ord("¡"), ord("¬") + 1)) +
+                       list(range(ord("®"), ord("ÿ") + 1)))
+        char_values = byte_values.copy()
+        extra = 0
+        for b in range(256):
+            if b not in byte_values:
+                byte_values.append(b)
+                char_values.append(256 + extra)
+                extra += 1
+        return {b: chr(c) for b, c in zip(byte_values, char_values)}
+
+    def warm_cache(self):
+        """Pre-tokenize the renamed identifiers, which recur in almost every sample."""
+        pool = FuncVarNameRefactator().identifiers
+        for names in pool.values():
+            for name in names:
+                # Warm the pieces the pre-tokenizer actually produces (it splits on `_`)
+                for text in (name, " " + name):
+                    for piece in self.PRETOKENIZE_PATTERN.findall(text):
+                        if piece not in self.pinned:
+                            self.pinned[piece] = self.bpe_ids(piece)
+
+    def bpe(self, token):
+        """Apply merges to a byte-encoded token and return its sub-word strings."""
+        word = list(token)
+        while len(word) > 1:
+            best_rank, best_idx = None, None
+            for idx in range(len(word) - 1):
+                rank = self.bpe_ranks.get((word[idx], word[idx + 1]))
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_idx = rank, idx
+            if best_rank is None:
+                break
+            first, second = word[best_idx], word[best_idx + 1]
+            merged = []
+            idx = 0
+            while idx < len(word):
+                if idx < len(word) - 1 and word[idx] == first and word[idx + 1] == second:
+                    merged.append(first + second)
+                    idx += 2
+                else:
+                    merged.append(word[idx])
+                    idx += 1
+            word = merged
+        return word
+
+    def bpe_ids(self, piece):
+        """Run BPE on a pre-tokenized piece and map the result to token IDs."""
+        token = "".join(self.byte_encoder[b] for b in piece.encode("utf-8"))
+        try:
+            return tuple(self.encoder[sub] for sub in self.bpe(token))
+        except KeyError as e:
+            raise ValueError(f"Token not in vocabulary: {e.args[0]!r}")
+
+    def encode_piece(self, piece):
+        """Encode a single pre-tokenized piece, using the merge caches when possible."""
+        ids = self.pinned.get(piece)
+        if ids is None:
+            ids = self.cache.get(piece)
+        if ids is None:
+            ids = self.bpe_ids(piece)
+            if len(self.cache) >= self.cache_size:
+                del self.cache[next(iter(self.cache))]
+            self.cache[piece] = ids
+        return ids
+
+    def encode(self, text):
+        """Encode text into a list of token IDs."""
+        ids = []
+        for piece in self.PRETOKENIZE_PATTERN.findall(text):
+            ids.extend(self.encode_piece(piece))
+        if self.eos_id is not None:
+            ids.append(self.eos_id)
+        return ids
+
+    def encode_batch(self, texts):
+        """Encode a batch of texts; repeated pieces across the batch hit the cache."""
+        return [self.encode(text) for text in texts]
+
+    @staticmethod
+    def _npy_bytes(values, typecode, descr):
+        """Serialize a flat array in the .npy v1.0 format."""
+        data = array(typecode, values)
+        if sys.byteorder == "big":
+            descr = descr.replace("<", ">")
+        header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({len(data)},), }}"
+        # Magic (6) + version (2) + header length (2) + header must be a multiple of 64
+        padding = 64 - (10 + len(header) + 1) % 64
+        header = header + " " * (padding % 64) + "\n"
+        return (b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") +
+                header.encode("latin1") + data.tobytes())
+
+    def pack(self, token_lists):
+        """Pack token ID lists into a flat token array and an offsets array."""
+        offsets = [0]
+        flat = []
+        for ids in token_lists:
+            flat.extend(ids)
+            offsets.append(len(flat))
+        if max(self.encoder.values(), default=0) < 2 ** 16:
+            tokens = self._npy_bytes(flat, "H", "<u2")
+        else:
+            tokens = self._npy_bytes(flat, "I", "<u4")
+        return tokens, self._npy_bytes(offsets, "q", "<i8")
+
+    def write_shard(self, texts, path, skip_unchanged=False):
+        """Write texts to `<path>.jsonl` and their token IDs to `<path>.npz`.
+
+        The archive holds `tokens` (all IDs, concatenated) and `offsets`, so
+        sample i is `tokens[offsets[i]:offsets[i + 1]]` after `numpy.load`.
+        With `skip_unchanged`, refactorer outputs reported as unchanged are dropped.
+        Row i always came from input `indices[i]`, stored both as the `index`
+        field of each JSONL record and as the `indices` array of the archive.
+        """
+        texts = list(texts)
+        indices = [idx for idx, text in enumerate(texts)
+                   if not skip_unchanged or getattr(text, "changed", True)]
+        texts = [texts[idx] for idx in indices]
+        texts = [ast.unparse(text) if isinstance(text, ast.AST) else text for text in texts]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        text_path = f"{path}.jsonl"
+        with open(text_path, "w", encoding="utf-8") as f:
+            for idx, text in zip(indices, texts):
+                f.write(json.dumps({"text": text, "index": idx}) + "\n")
+
+        token_path = f"{path}.npz"
+        tokens, offsets = self.pack(self.encode_batch(texts))
+        with zipfile.ZipFile(token_path, "w", zipfile.ZIP_STORED) as archive:
+            archive.writestr("tokens.npy", tokens)
+            archive.writestr("offsets.npy", offsets)
+            archive.writestr("indices.npy", self._npy_bytes(indices, "q", "<i8"))
+        return text_path, token_path
@@ -1,20 +1,38 @@
 import ast
 import os
-import random
 
-class ErrorHandlerRefactor(ast.NodeTransformer):
+from editscript import VariantEditScript
+from patternrules import Node, OneOf, RuleSet
+from refactorbase import ReentrantRefactor
+
+class ErrorHandlerRefactor(ast.NodeTransformer, ReentrantRefactor):
     SIGNATURES = ['pkcs1_15', 'pss', 'eddsa', 'DSS']
     EXCEPTIONS = ['e', 'exception', 'exc', 'err', 'error']
     ERROR_MESSAGES = ['ERROR:', 'Exception encountered.', 'Operation failed.']
+    RULES = RuleSet([
+        # Signature generation via a chained call (e.g., sig = pkcs1_15.new(key).sign(h))
+        ("signature_call", Node(ast.Assign, value=Node(ast.Call, func=Node(
+            ast.Attribute, value=Node(ast.Call, func=Node(
+                ast.Attribute, value=Node(ast.Name, id=OneOf(SIGNATURES)))))))),
+        # Signer/verifier definition (e.g., signer = pkcs1_15.new(key))
+        ("signer_definition", Node(ast.Assign, value=Node(ast.Call, func=Node(
+            ast.Attribute, value=Node(ast.Name, id=OneOf(SIGNATURES)))))),
+        # Signature generation/verification (e.g., sig = signer.sign(h))
+        ("sign_or_verify", Node(ast.Assign, value=Node(ast.Call, func=Node(
+            ast.Attribute, attr=OneOf(['sign', 'verify']))))),
+    ])
 
     def __init__(self):
+        self.reset_state()
+
+    def reset_state(self):
         self.def_mapping = {}      # Maps FunctionDef nodes to indices of lines to remove
         self.remove_lines = set()  # Set of indices of module-level lines to remove
         self.init_body = None      # Temporary storage for multi-statement try blocks
 
     def get_handler_block(self):
         """Generate an ExceptHandler block with a random exception name and message."""
-        exception_id = random.choice(self.EXCEPTIONS)
+        exception_id = self.rng.choice(self.EXCEPTIONS)
         return [ast.ExceptHandler(
             type=ast.Name(id='Exception', ctx=ast.Load()),
             name=exception_id,
@@ -25,7 +43,7 @@ class ErrorHandlerRefactor(ast.NodeTransformer):
                         args=[
                             ast.JoinedStr(
                                 values=[
-                                    ast.Constant(value=random.choice(self.ERROR_MESSAGES)),
+                                    ast.Constant(value=self.rng.choice(self.ERROR_MESSAGES)),
                                     ast.FormattedValue(
                                         value=ast.Name(id=exception_id, ctx=ast.Load()),
                                         conversion=-1
@@ -41,37 +59,31 @@ class ErrorHandlerRefactor(ast.NodeTransformer):
 
     def process_assign(self, stmt, is_module_level=False):
         """Process an Assign node to determine if it needs a try-except block."""
-        if not (isinstance(stmt, ast.Assign) and not isinstance(stmt.value, ast.Constant)):
+        match = self.RULES.match(stmt)
+        if match is None:
             return None, False
 
         init_body = None
         needs_removal = False
+        rule, _ = match
 
         # Case 1: Signature generation via Call (e.g., pkcs1_15.new())
-        if (isinstance(stmt.value, ast.Call) and 
-            isinstance(stmt.value.func, ast.Attribute) and 
-            isinstance(stmt.value.func.value, ast.Call) and 
-            isinstance(stmt.value.func.value.func, ast.Attribute) and 
-            isinstance(stmt.value.func.value.func.value, ast.Name) and 
-            stmt.value.func.value.func.value.id in self.SIGNATURES):
+        if rule == "signature_call":
             init_body = [stmt]
 
-        # Case 2: Signer/verifier definition or signature generation/verification
-        elif (isinstance(stmt.value, ast.Call) and 
-              isinstance(stmt.value.func, ast.Attribute)):
-            # Signer/verifier definition (e.g., pkcs1_15.new())
-            if (isinstance(stmt.value.func.value, ast.Name) and 
-                stmt.value.func.value.id in self.SIGNATURES):
-                self.init_body = [stmt] if self.init_body is None else self.init_body + [stmt]
-                return None, True  # Defer processing until sign/verify
-            # Signature generation/verification (e.g., signer.sign())
-            elif stmt.value.func.attr in ['sign', 'verify']:
-                if self.init_body is not None:
-                    init_body = self.init_body + [stmt]
-                    self.init_body = None
-                    needs_removal = True
-                else:
-                    init_body = [stmt]
+        # Case 2: Signer/verifier definition (e.g., pkcs1_15.new())
+        elif rule == "signer_definition":
+            self.init_body = [stmt] if self.init_body is None else self.init_body + [stmt]
+            return None, True  # Defer processing until sign/verify
+
+        # Case 3: Signature generation/verification (e.g., signer.sign())
+        elif rule == "sign_or_verify":
+            if self.init_body is not None:
+                init_body = self.init_body + [stmt]
+                self.init_body = None
+                needs_removal = True
+            else:
+                init_body = [stmt]
 
         return init_body, needs_removal
 
@@ -90,6 +102,7 @@ class ErrorHandlerRefactor(ast.NodeTransformer):
                     orelse=[],
                     finalbody=[]
                 )
+                self.changed = True
                 ast.fix_missing_locations(new_body[idx])
                 if needs_removal and idx > 0:
                     lines_to_remove.append(idx - 1)
@@ -117,6 +130,7 @@ class ErrorHandlerRefactor(ast.NodeTransformer):
                     orelse=[],
                     finalbody=[]
                 )
+                self.changed = True
                 ast.fix_missing_locations(new_body[idx])
                 if needs_removal and idx > 0:
                     self.remove_lines.add(idx - 1)
@@ -127,14 +141,20 @@ class ErrorHandlerRefactor(ast.NodeTransformer):
         self.generic_visit(node)
         return node
 
-    def refactor_error_handling(self, tree):
-        self.visit(tree)
-        ast.fix_missing_locations(tree)
-        return ast.unparse(tree)
+    def refactor_error_handling(self, tree, *, rng=None, source_code=None):
+        worker = self.fork(rng)
+        worker.visit(tree)
+        return worker.finish(tree, source_code=source_code)
 
-    def get_refacctored_code(self, source_code):
+    def get_refacctored_code(self, source_code, *, rng=None):
         try:
             tree = ast.parse(source_code)
-            return self.refactor_error_handling(tree)
+            return self.refactor_error_handling(tree, rng=rng, source_code=source_code)
         except SyntaxError as e:
             raise ValueError(f"Syntax error in source code: {e}")
+
+    def get_edit_script(self, source_code, *, rng=None):
+        """Refactor source code and return the variant as an edit script against it."""
+        refactored_code = self.get_refacctored_code(source_code, rng=rng)
+        return VariantEditScript().create(source_code, refactored_code,
+                                          meta={"transform": type(self).__name__})